@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Text kernels for the PDF extraction services
+Fuses character stripping and title selection into a single pass over the
+codepoints, JIT-compiled with Numba when available (pure Python otherwise)
+"""
+
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Regex fallback for whitespace collapsing on non-ASCII text
+_WS_RE = re.compile(r'\s+')
+
+NUMBA_AVAILABLE = False
+try:
+    import numpy as np
+    from numba import njit
+    NUMBA_AVAILABLE = True
+    logger.info("✅ numba available, using JIT text kernels")
+except ImportError as e:
+    logger.warning(f"⚠️ numba/numpy not available, using pure-Python text ops: {e}")
+
+# Codepoints stripped from extracted text before database storage: null bytes,
+# control characters, the replacement character, the private use area and the
+# specials block (mirrors clean_text_for_database)
+_STRIP_CODEPOINTS = [0, *range(0x01, 0x09), 0x0B, 0x0C, *range(0x0E, 0x20), 0x7F,
+                     0xFFFD, *range(0xE000, 0xF900), *range(0xFFF0, 0x10000)]
+_STRIP_TABLE = dict.fromkeys(_STRIP_CODEPOINTS, None)
+
+# Title candidates: first meaningful line among the first ten lines
+_TITLE_MAX_LINES = 10
+
+if NUMBA_AVAILABLE:
+    # Bitmap of stripped codepoints; everything above the BMP is always kept
+    _STRIP_MASK = np.zeros(0x10000, dtype=np.uint8)
+    for _cp in _STRIP_CODEPOINTS:
+        _STRIP_MASK[_cp] = 1
+
+    @njit(cache=True, nogil=True)
+    def _clean_and_find_title_nb(codepoints, strip_mask, max_lines):
+        """Single-pass strip + title scan over a uint32 codepoint array.
+
+        Returns (out, out_len, title_start, title_end) where the title slice
+        refers to the output buffer, or (-1, -1) when no line qualifies.
+        """
+        n = codepoints.shape[0]
+        out = np.empty(n, dtype=np.uint32)
+        out_len = 0
+        title_start = -1
+        title_end = -1
+        line_no = 0
+        line_start = 0
+        for i in range(n + 1):
+            cp = codepoints[i] if i < n else 10  # treat EOF as a line break
+            if cp < 0x10000 and strip_mask[cp]:
+                continue
+            if cp == 10:
+                if title_start < 0 and line_no < max_lines:
+                    # Strip surrounding spaces/tabs/CRs from the candidate
+                    s = line_start
+                    e = out_len
+                    while s < e and (out[s] == 32 or out[s] == 9 or out[s] == 13):
+                        s += 1
+                    while e > s and (out[e - 1] == 32 or out[e - 1] == 9 or out[e - 1] == 13):
+                        e -= 1
+                    length = e - s
+                    if 10 < length < 100:
+                        all_digit = True
+                        has_page = False
+                        for j in range(s, e):
+                            c = out[j]
+                            if c < 48 or c > 57:
+                                all_digit = False
+                            if (c == 80 and j + 3 < e and out[j + 1] == 97
+                                    and out[j + 2] == 103 and out[j + 3] == 101):
+                                has_page = True
+                        if not all_digit and not has_page:
+                            title_start = s
+                            title_end = e
+                line_no += 1
+                if i < n:
+                    out[out_len] = cp
+                    out_len += 1
+                line_start = out_len
+            else:
+                out[out_len] = cp
+                out_len += 1
+        return out, out_len, title_start, title_end
+
+    @njit(cache=True, nogil=True)
+    def _collapse_ws_nb(buf):
+        """Collapse runs of ASCII whitespace to single spaces in one scan.
+
+        Byte-level loop over a uint8 view: tracks whether the previous byte
+        was whitespace and writes compacted output to a preallocated buffer,
+        avoiding the regex engine's per-codepoint dispatch entirely.
+        """
+        n = buf.shape[0]
+        out = np.empty(n, dtype=np.uint8)
+        out_len = 0
+        prev_ws = False
+        for i in range(n):
+            b = buf[i]
+            if b == 32 or (9 <= b <= 13):
+                if not prev_ws:
+                    out[out_len] = 32
+                    out_len += 1
+                prev_ws = True
+            else:
+                out[out_len] = b
+                out_len += 1
+                prev_ws = False
+        return out[:out_len]
+
+    # Warm the JIT cache at import so the first request isn't penalized
+    try:
+        _clean_and_find_title_nb(np.zeros(1, dtype=np.uint32), _STRIP_MASK, _TITLE_MAX_LINES)
+        _collapse_ws_nb(np.zeros(1, dtype=np.uint8))
+    except Exception as e:  # pragma: no cover - compilation issues shouldn't kill the service
+        logger.warning(f"⚠️ numba kernel warm-up failed, using pure-Python text ops: {e}")
+        NUMBA_AVAILABLE = False
+
+def collapse_ws(text):
+    """Collapse every whitespace run to a single space.
+
+    ASCII text (the overwhelming case for extracted PDFs) goes through the
+    Numba byte kernel when available; anything else falls back to the regex.
+    Note the caller is expected to have stripped control characters already.
+    """
+    if not text:
+        return text
+    if NUMBA_AVAILABLE and text.isascii():
+        buf = np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+        return _collapse_ws_nb(buf).tobytes().decode('ascii')
+    return _WS_RE.sub(' ', text)
+
+def _clean_and_find_title_py(text):
+    """Pure-Python fallback for clean_and_find_title"""
+    cleaned = text.translate(_STRIP_TABLE)
+    title = None
+    for line in cleaned.split('\n')[:_TITLE_MAX_LINES]:
+        candidate = line.strip()
+        if 10 < len(candidate) < 100 and not candidate.isdigit() and 'Page' not in candidate:
+            title = candidate
+            break
+    return cleaned, title
+
+def clean_and_find_title(text):
+    """Strip forbidden codepoints and pick a title candidate in one pass.
+
+    Returns (cleaned_text, title). The title is the first of the first ten
+    lines whose stripped length is between 10 and 100 exclusive, is not all
+    digits and does not contain 'Page'; None when no line qualifies.
+    """
+    if not text:
+        return "", None
+
+    if NUMBA_AVAILABLE:
+        codepoints = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+        out, out_len, title_start, title_end = _clean_and_find_title_nb(
+            codepoints, _STRIP_MASK, _TITLE_MAX_LINES)
+        cleaned = out[:out_len].tobytes().decode('utf-32-le')
+        title = out[title_start:title_end].tobytes().decode('utf-32-le') if title_start >= 0 else None
+        return cleaned, title
+
+    return _clean_and_find_title_py(text)
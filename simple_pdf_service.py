@@ -6,23 +6,87 @@ A lightweight Python microservice for PDF text extraction using PyPDF2 and PyMuP
 
 import os
 import sys
+import hashlib
+import json
 import logging
+import mmap
+import queue
 import tempfile
-from flask import Flask, request, jsonify
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import requests
-import PyPDF2
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import fitz  # PyMuPDF
 from pathlib import Path
 
+# The fallback reader is rarely reached when PyMuPDF succeeds, so its
+# import is deferred to first use — workers that never fall back never pay
+# the import time or resident memory for it. pypdf (the maintained, much
+# faster successor) is preferred; PyPDF2 keeps old deployments working.
+_fallback_reader = None  # (PdfReader, PdfReadError, name), loaded lazily
+_fallback_reader_lock = threading.Lock()
+
+def _get_fallback_reader():
+    """Import and cache the fallback PDF reader on first use"""
+    global _fallback_reader
+    if _fallback_reader is None:
+        with _fallback_reader_lock:
+            if _fallback_reader is None:
+                try:
+                    from pypdf import PdfReader
+                    from pypdf.errors import PdfReadError
+                    _fallback_reader = (PdfReader, PdfReadError, 'pypdf')
+                except ImportError:
+                    from PyPDF2 import PdfReader
+                    from PyPDF2.errors import PdfReadError
+                    _fallback_reader = (PdfReader, PdfReadError, 'PyPDF2')
+    return _fallback_reader
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# orjson's Rust encoder is 5-10x faster than stdlib json on the large
+# extracted-text payloads this service returns
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# numpy is used to count words in large texts without materializing them
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)  # Enable CORS for React Native
 
+if ORJSON_AVAILABLE:
+    from flask.json.provider import DefaultJSONProvider
+
+    class OrjsonProvider(DefaultJSONProvider):
+        """Route every jsonify call through orjson"""
+
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    app.json = OrjsonProvider(app)
+    logger.info("✅ orjson available, using it for JSON responses")
+else:
+    logger.warning("⚠️ orjson not available, using stdlib json")
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -32,129 +96,604 @@ def health_check():
         'version': '1.0.0'
     })
 
-def extract_with_pypdf2(pdf_path):
-    """Extract text using PyPDF2 with improved error handling"""
+# Responses whose extracted content exceeds this many characters are
+# streamed: jsonify holds the Python string and the full encoded JSON
+# bytes in memory at once, roughly doubling peak RSS on 1000-page documents
+_STREAM_JSON_MIN_CHARS = 1 << 20
+
+def _json_response(response_data):
+    """Serialize an extraction response, streaming when the content is large"""
+    if len(response_data.get('content') or '') < _STREAM_JSON_MIN_CHARS:
+        return jsonify(response_data)
+    return Response(
+        stream_with_context(json.JSONEncoder().iterencode(response_data)),
+        mimetype='application/json'
+    )
+
+# Content-hash cache of extraction results: identical PDF bytes sent twice
+# (common with retrying mobile clients) skip the PyMuPDF/PyPDF2 work entirely
+_EXTRACT_CACHE_MAX = 128
+_extract_cache = {}  # (sha256 hex, size) -> extractor result dict
+_extract_cache_lock = threading.Lock()
+
+def hash_pdf_file(pdf_path):
+    """SHA-256 of a file's bytes without loading the whole file into memory"""
+    with open(pdf_path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+def extract_cache_get(cache_key):
+    """Return the cached extraction result for this content hash, or None"""
+    with _extract_cache_lock:
+        result = _extract_cache.get(cache_key)
+    if result is not None:
+        logger.info(f"⚡ Extraction cache hit for {cache_key[0][:16]}...")
+    return result
+
+# Texts below this size just use str.split — the numpy round-trip only
+# pays for itself once the word list would be large
+_WORD_COUNT_MIN_CHARS = 65536
+
+def count_words(text):
+    """Count whitespace-separated tokens without materializing them.
+
+    len(text.split()) allocates every word as a Python object just to take
+    the list's length — hundreds of thousands of strings for a textbook.
+    Large texts instead count space-to-nonspace transitions over a numpy
+    byte mask in vectorized C. The mask treats all bytes <= 0x20 as
+    whitespace, a negligible divergence from str.split on extracted text.
+    """
+    if not text:
+        return 0
+    if NUMPY_AVAILABLE and len(text) > _WORD_COUNT_MIN_CHARS:
+        arr = np.frombuffer(text.encode('utf-8', 'ignore'), dtype=np.uint8)
+        ws = arr <= 32
+        count = int(np.count_nonzero(ws[:-1] & ~ws[1:]))
+        if not ws[0]:
+            count += 1
+        return count
+    return len(text.split())
+
+def _parse_extraction_limits(source):
+    """Read the optional max_pages/max_chars budgets from a body or form.
+
+    RAG-style callers often only need the first few pages; these budgets
+    let them stop the page walk early instead of paying for the full
+    document. Returns (max_pages, max_chars), each None when absent or
+    invalid.
+    """
+    limits = []
+    for name in ('max_pages', 'max_chars'):
+        value = source.get(name)
+        try:
+            value = int(value) if value is not None else None
+        except (TypeError, ValueError):
+            value = None
+        limits.append(value if value and value > 0 else None)
+    return tuple(limits)
+
+def extract_cache_put(cache_key, result):
+    """Cache an extraction result, evicting the oldest entry when full"""
+    with _extract_cache_lock:
+        if len(_extract_cache) >= _EXTRACT_CACHE_MAX:
+            _extract_cache.pop(next(iter(_extract_cache)))
+        _extract_cache[cache_key] = result
+
+# One long-lived HTTP session for all outbound requests: most PDFs come
+# from the same S3/CDN hosts, so pooled keep-alive connections skip the
+# ~100ms TCP+TLS handshake (and the DNS lookup) on every download
+_http = requests.Session()
+_http_adapter = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=64,
+    max_retries=Retry(total=2, backoff_factor=0.3),
+)
+_http.mount('https://', _http_adapter)
+_http.mount('http://', _http_adapter)
+
+# The Docling /health probe result is cached for a short window — every
+# file:// request otherwise paid up to 5s of synchronous probing for an
+# answer that rarely changes
+_DOCLING_HEALTH_TTL = 30.0
+_docling_health = {'ts': 0.0, 'ok': False, 'url': None}
+_docling_health_lock = threading.Lock()
+
+def _docling_available(docling_url):
+    """Probe the Docling service's /health, caching the answer for 30s"""
+    now = time.monotonic()
+    with _docling_health_lock:
+        if (_docling_health['url'] == docling_url
+                and now - _docling_health['ts'] < _DOCLING_HEALTH_TTL):
+            return _docling_health['ok']
+    ok = False
     try:
-        # Check if file exists and is readable
-        if not os.path.exists(pdf_path):
+        health_response = _http.get(f"{docling_url}/health", timeout=5)
+        ok = bool(health_response.ok and health_response.json().get('docling_available'))
+    except Exception as probe_error:
+        logger.warning(f"⚠️ Could not reach Docling service: {probe_error}")
+    with _docling_health_lock:
+        _docling_health.update(ts=now, ok=ok, url=docling_url)
+    return ok
+
+# Failure reasons returned by the extractors alongside the result, so the
+# caller can tell whether the fallback reader has any chance of doing
+# better (a corrupt xref might parse differently; a password never will)
+REASON_OK = 'ok'
+REASON_ENCRYPTED = 'encrypted'
+REASON_TRUNCATED = 'truncated'
+REASON_CORRUPT = 'corrupt'
+REASON_EMPTY = 'empty'
+
+# Content types accepted for URL downloads; comparison is one set lookup
+# on the lowercased media type instead of chained substring scans
+_ACCEPTED_CT = frozenset([
+    'application/pdf',
+    'application/octet-stream',
+    'application/x-pdf',
+    'binary/octet-stream',
+])
+
+# Flags for page.get_text(): the callers of this service only want a flat
+# string plus word/char counts, so skip ligature and exact-whitespace
+# preservation — both exist purely for layout-faithful output. Tradeoff:
+# ligature glyphs are expanded into their constituent characters ("f"+"i"
+# instead of the single fi codepoint — better for search and counting)
+# and runs of spaces are not reproduced exactly; str.split() tokenizes on
+# whitespace runs regardless, so the counts are unaffected.
+_TEXT_FLAGS = fitz.TEXTFLAGS_TEXT & ~fitz.TEXT_PRESERVE_LIGATURES & ~fitz.TEXT_PRESERVE_WHITESPACE
+
+# Documents with fewer pages than this are extracted serially — fork and IPC
+# overhead would outweigh the parallel win on small PDFs
+_PARALLEL_PAGE_MIN = 4
+
+# Lazily created worker pool shared by all requests
+_page_pool = None
+_page_pool_lock = threading.Lock()
+
+def _get_page_pool():
+    """Get or create the shared per-page extraction process pool"""
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is None:
+            _page_pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+    return _page_pool
+
+def _extract_page_text(args):
+    """Extract a single page's text in a worker process"""
+    pdf_path, page_num = args
+    doc = fitz.open(pdf_path)
+    try:
+        return page_num, doc[page_num].get_text("text", flags=_TEXT_FLAGS)
+    finally:
+        doc.close()
+
+def _extract_pages_parallel(pdf_path, page_count):
+    """Fan page extraction out across the process pool, in page order"""
+    workers = os.cpu_count() or 1
+    chunksize = max(1, page_count // (4 * workers))
+    results = _get_page_pool().map(
+        _extract_page_text,
+        ((pdf_path, page_num) for page_num in range(page_count)),
+        chunksize=chunksize
+    )
+    parts = [None] * page_count
+    for page_num, page_text in results:
+        parts[page_num] = page_text
+    return "".join(page_text + "\n" for page_text in parts if page_text)
+
+def extract_with_pypdf2(pdf_path, max_pages=None, max_chars=None):
+    """Extract text using the fallback reader (pypdf, or PyPDF2 if that's all we have).
+
+    Returns (result, reason); result is None on failure with the reason
+    telling the caller why.
+    """
+    FallbackPdfReader, PdfReadError, _FALLBACK_READER = _get_fallback_reader()
+    try:
+        # One stat answers both existence and size
+        try:
+            if os.stat(pdf_path).st_size == 0:
+                logger.error(f"File is empty: {pdf_path}")
+                return None, REASON_EMPTY
+        except OSError:
             logger.error(f"File does not exist: {pdf_path}")
-            return None
-            
-        if os.path.getsize(pdf_path) == 0:
-            logger.error(f"File is empty: {pdf_path}")
-            return None
-        
+            return None, REASON_EMPTY
+
         with open(pdf_path, 'rb') as file:
             # Try to create PDF reader with error handling
             try:
-                pdf_reader = PyPDF2.PdfReader(file, strict=False)  # Use non-strict mode
-            except PyPDF2.errors.PdfReadError as pdf_error:
-                logger.error(f"PyPDF2 failed to read PDF structure: {str(pdf_error)}")
-                return None
-            
+                pdf_reader = FallbackPdfReader(file, strict=False)  # Use non-strict mode
+            except PdfReadError as pdf_error:
+                logger.error(f"{_FALLBACK_READER} failed to read PDF structure: {str(pdf_error)}")
+                return None, REASON_CORRUPT
+
             # Check if PDF is encrypted
             if pdf_reader.is_encrypted:
                 logger.error("PDF is password protected")
-                return None
-            
+                return None, REASON_ENCRYPTED
+
             # Check if PDF has pages
             if len(pdf_reader.pages) == 0:
                 logger.error("PDF has no pages")
-                return None
+                return None, REASON_EMPTY
             
-            # Extract text page by page with error handling
-            text = ""
+            # Extract text page by page with error handling; collect chunks
+            # and join once — += concatenation is quadratic in total characters.
+            # Bind the append method once: the loop body is pure dispatch on
+            # top of C calls, so per-page attribute lookups are measurable
+            parts = []
+            append = parts.append
             page_count = len(pdf_reader.pages)
-            
+            scan_pages = min(page_count, max_pages) if max_pages else page_count
+            running_chars = 0
+
             for page_num, page in enumerate(pdf_reader.pages):
+                if page_num >= scan_pages:
+                    break
                 try:
                     page_text = page.extract_text()
                     if page_text:
-                        text += page_text + "\n"
+                        append(page_text)
+                        running_chars += len(page_text)
+                        if max_chars and running_chars >= max_chars:
+                            break
                 except Exception as page_error:
                     logger.warning(f"Failed to extract text from page {page_num + 1}: {str(page_error)}")
                     continue
-            
+            text = "\n".join(parts)
+
             return {
                 'text': text.strip(),
                 'page_count': page_count,
-                'method': 'PyPDF2'
-            }
-            
+                'method': _FALLBACK_READER
+            }, REASON_OK
+
     except Exception as e:
         error_msg = str(e).lower()
         if "eof" in error_msg or "marker" in error_msg:
-            logger.error(f"PyPDF2 extraction failed - Truncated PDF: {str(e)}")
+            logger.error(f"{_FALLBACK_READER} extraction failed - Truncated PDF: {str(e)}")
+            return None, REASON_TRUNCATED
         elif "password" in error_msg or "encrypted" in error_msg:
-            logger.error(f"PyPDF2 extraction failed - Password protected PDF: {str(e)}")
+            logger.error(f"{_FALLBACK_READER} extraction failed - Password protected PDF: {str(e)}")
+            return None, REASON_ENCRYPTED
         else:
-            logger.error(f"PyPDF2 extraction failed: {str(e)}")
+            logger.error(f"{_FALLBACK_READER} extraction failed: {str(e)}")
+        return None, REASON_CORRUPT
+
+# Local files above this size are memory-mapped into fitz so the OS page
+# cache serves bytes on demand instead of malloc'ing the whole file up front
+_MMAP_THRESHOLD = 4 * 1024 * 1024
+
+# Opening a fitz document re-parses the cross-reference structure, which
+# can cost hundreds of ms on big PDFs — and the fallback-retry pattern and
+# repeated budgeted requests hit the same file more than once. Recently
+# used handles are kept in a small LRU keyed by (path, mtime, size), with
+# any attached mmap/fd closed on eviction. Handles are checked OUT while
+# in use, so two threads never share a document: a concurrent request for
+# the same file simply opens its own copy.
+_DOC_CACHE_MAX = 32
+_doc_cache = OrderedDict()  # (path, mtime, size) -> (doc, mm, fd)
+_doc_cache_lock = threading.Lock()
+
+def _close_doc_entry(entry):
+    """Close a cached document and whatever backs it, ignoring errors"""
+    doc, mm, fd = entry
+    for closer in (doc.close, mm.close if mm is not None else None):
+        if closer:
+            try:
+                closer()
+            except Exception:
+                pass
+    if fd is not None:
+        try:
+            os.close(fd)
+        except OSError:
+            pass
+
+def _evict_cached_docs(path):
+    """Drop cached documents for a path whose bytes are about to change"""
+    with _doc_cache_lock:
+        stale = [key for key in _doc_cache if key[0] == path]
+        entries = [_doc_cache.pop(key) for key in stale]
+    for entry in entries:
+        _close_doc_entry(entry)
+
+def _doc_cache_checkout(key):
+    """Pop a cached open document for exclusive use, or None"""
+    with _doc_cache_lock:
+        entry = _doc_cache.pop(key, None)
+    if entry is None:
+        return None
+    if entry[0].is_closed:
+        # The document is dead but its mmap/fd may still be live — close
+        # them rather than dropping the raw descriptor on the floor
+        _close_doc_entry(entry)
         return None
+    return entry
+
+def _doc_cache_checkin(key, entry):
+    """Return a document to the cache, evicting the oldest when full.
 
-def extract_with_pymupdf(pdf_path):
-    """Extract text using PyMuPDF (fitz) with improved error handling"""
+    Two threads can finish with their own copies of the same file at the
+    same time; the displaced entry for the key must be closed like any
+    eviction, or its fd would leak.
+    """
+    evicted = []
+    with _doc_cache_lock:
+        displaced = _doc_cache.pop(key, None)
+        if displaced is not None:
+            evicted.append(displaced)
+        _doc_cache[key] = entry
+        while len(_doc_cache) > _DOC_CACHE_MAX:
+            evicted.append(_doc_cache.popitem(last=False)[1])
+    for old in evicted:
+        _close_doc_entry(old)
+
+def extract_with_pymupdf(pdf_path, max_pages=None, max_chars=None, st=None):
+    """Extract text using PyMuPDF (fitz) with improved error handling.
+
+    Returns (result, reason); result is None on failure with the reason
+    telling the caller why. Callers that already stat'd the file can pass
+    the result in via st to avoid repeating the syscall.
+    """
     doc = None
+    fd = None
+    mm = None
+    cache_entry_key = None
     try:
-        # Check if file exists and is readable
-        if not os.path.exists(pdf_path):
+        # One stat answers existence, size and mtime
+        try:
+            st = st or os.stat(pdf_path)
+        except OSError:
             logger.error(f"File does not exist: {pdf_path}")
-            return None
-            
-        if os.path.getsize(pdf_path) == 0:
+            return None, REASON_EMPTY
+
+        file_size = st.st_size
+        if file_size == 0:
             logger.error(f"File is empty: {pdf_path}")
-            return None
-        
-        # Try to open the document with error handling
-        doc = fitz.open(pdf_path)
-        
-        # Check if document is valid
-        if doc.is_closed:
-            logger.error("Document was closed immediately after opening")
-            return None
-            
-        if doc.page_count == 0:
-            logger.error("Document has no pages")
-            return None
-        
-        # Extract text page by page with error handling
-        text = ""
-        page_count = doc.page_count
-        metadata = doc.metadata or {}
-        
-        for page_num in range(page_count):
+            return None, REASON_EMPTY
+
+        cache_entry_key = (pdf_path, st.st_mtime, file_size)
+        cached = _doc_cache_checkout(cache_entry_key)
+        if cached is not None:
+            doc, mm, fd = cached
+        # Try to open the document with error handling; large files are
+        # memory-mapped so pages never visited never get paged in
+        elif file_size > _MMAP_THRESHOLD:
+            fd = os.open(pdf_path, os.O_RDONLY)
+            mm = mmap.mmap(fd, 0, prot=mmap.PROT_READ)
+            doc = fitz.open(stream=mm, filetype='pdf')
+        else:
+            doc = fitz.open(pdf_path)
+        result, reason = _extract_from_open_doc(doc, pdf_path=pdf_path,
+                                                max_pages=max_pages, max_chars=max_chars)
+        if not doc.is_closed:
+            # Hand the open handle to the cache; the finally block must
+            # not close what the cache now owns
+            _doc_cache_checkin(cache_entry_key, (doc, mm, fd))
+            doc = mm = fd = None
+        return result, reason
+
+    except Exception as e:
+        error_msg = str(e).lower()
+        if "broken" in error_msg or "corrupt" in error_msg:
+            logger.error(f"PyMuPDF extraction failed - Corrupted PDF: {str(e)}")
+            return None, REASON_CORRUPT
+        elif "password" in error_msg or "encrypted" in error_msg:
+            logger.error(f"PyMuPDF extraction failed - Password protected PDF: {str(e)}")
+            return None, REASON_ENCRYPTED
+        else:
+            logger.error(f"PyMuPDF extraction failed: {str(e)}")
+        return None, REASON_CORRUPT
+    finally:
+        # Ensure document, mapping and descriptor are properly closed
+        if doc and not doc.is_closed:
             try:
-                page = doc[page_num]
-                page_text = page.get_text()
-                if page_text:
-                    text += page_text + "\n"
-            except Exception as page_error:
-                logger.warning(f"Failed to extract text from page {page_num + 1}: {str(page_error)}")
-                continue
-        
-        return {
-            'text': text.strip(),
-            'page_count': page_count,
-            'metadata': metadata,
-            'method': 'PyMuPDF'
-        }
-        
+                doc.close()
+            except:
+                pass
+        if mm is not None:
+            try:
+                mm.close()
+            except:
+                pass
+        if fd is not None:
+            try:
+                os.close(fd)
+            except:
+                pass
+
+def extract_with_pymupdf_bytes(data, max_pages=None, max_chars=None):
+    """Extract text from in-memory PDF bytes using PyMuPDF (no disk round-trip).
+
+    Returns (result, reason) like the path-based extractors.
+    """
+    doc = None
+    try:
+        if not data:
+            logger.error("PDF buffer is empty")
+            return None, REASON_EMPTY
+
+        doc = fitz.open(stream=data, filetype='pdf')
+        return _extract_from_open_doc(doc, max_pages=max_pages, max_chars=max_chars)
+
     except Exception as e:
         error_msg = str(e).lower()
         if "broken" in error_msg or "corrupt" in error_msg:
             logger.error(f"PyMuPDF extraction failed - Corrupted PDF: {str(e)}")
+            return None, REASON_CORRUPT
         elif "password" in error_msg or "encrypted" in error_msg:
             logger.error(f"PyMuPDF extraction failed - Password protected PDF: {str(e)}")
+            return None, REASON_ENCRYPTED
         else:
             logger.error(f"PyMuPDF extraction failed: {str(e)}")
-        return None
+        return None, REASON_CORRUPT
     finally:
-        # Ensure document is properly closed
         if doc and not doc.is_closed:
             try:
                 doc.close()
             except:
                 pass
 
+def _extract_from_open_doc(doc, pdf_path=None, max_pages=None, max_chars=None):
+    """Walk an open fitz document and build the extraction result.
+
+    A pdf_path enables the per-page process pool for multi-page documents;
+    in-memory documents always use the serial loop. max_pages/max_chars
+    stop the walk early once the caller's budget is met; page_count in the
+    result always reports the document's true page count. Returns
+    (result, reason).
+    """
+    # Check if document is valid
+    if doc.is_closed:
+        logger.error("Document was closed immediately after opening")
+        return None, REASON_CORRUPT
+
+    if doc.needs_pass:
+        logger.error("PDF is password protected")
+        return None, REASON_ENCRYPTED
+
+    if doc.page_count == 0:
+        logger.error("Document has no pages")
+        return None, REASON_EMPTY
+
+    page_count = doc.page_count
+    metadata = doc.metadata or {}
+
+    # Fast path for single-page PDFs (receipts, tickets dominate many
+    # workloads): one get_text call, no pool dispatch, no chunk list,
+    # no budget bookkeeping
+    if page_count == 1:
+        try:
+            text = doc.load_page(0).get_text("text", flags=_TEXT_FLAGS)
+        except Exception as page_error:
+            logger.warning(f"Failed to extract text from page 1: {str(page_error)}")
+            text = ""
+        return {
+            'text': text.strip(),
+            'page_count': 1,
+            'metadata': metadata,
+            'method': 'PyMuPDF'
+        }, REASON_OK
+
+    scan_pages = min(page_count, max_pages) if max_pages else page_count
+
+    # Multi-page documents fan pages out across the process pool (PyMuPDF
+    # does the heavy lifting in C, so workers scale nearly linearly);
+    # small ones stay serial to avoid fork overhead. A max_chars budget
+    # forces the serial loop — only it can stop mid-walk on a running total
+    text = None
+    if pdf_path and scan_pages >= _PARALLEL_PAGE_MIN and not max_chars:
+        try:
+            text = _extract_pages_parallel(pdf_path, scan_pages)
+        except Exception as pool_error:
+            logger.warning(f"Parallel page extraction failed, falling back to serial: {str(pool_error)}")
+
+    if text is None:
+        # Extract text page by page with error handling; collect chunks and
+        # join once — += concatenation is quadratic in total characters.
+        # fitz does the real work in C, so the loop is bytecode overhead:
+        # hoist the attribute lookups out of it
+        parts = []
+        append = parts.append
+        load_page = doc.load_page
+        running_chars = 0
+        for page_num in range(scan_pages):
+            try:
+                page_text = load_page(page_num).get_text("text", flags=_TEXT_FLAGS)
+                if page_text:
+                    append(page_text)
+                    running_chars += len(page_text)
+                    if max_chars and running_chars >= max_chars:
+                        break
+            except Exception as page_error:
+                logger.warning(f"Failed to extract text from page {page_num + 1}: {str(page_error)}")
+                continue
+        text = "\n".join(parts)
+
+    return {
+        'text': text.strip(),
+        'page_count': page_count,
+        'metadata': metadata,
+        'method': 'PyMuPDF'
+    }, REASON_OK
+
+# Request-scoped buffers are reused instead of reallocated: URL downloads
+# accumulate into a thread-local bytearray that is cleared between
+# requests, and fallback temp files come from a small pool of paths that
+# are truncated and handed back out, replacing a create/unlink syscall
+# pair per request with one ftruncate
+_dl_buf = threading.local()
+_TEMP_POOL_SIZE = 8
+_temp_path_pool = queue.Queue(maxsize=_TEMP_POOL_SIZE)
+
+def _get_download_buffer():
+    """Return this thread's reusable download bytearray, emptied"""
+    buf = getattr(_dl_buf, 'buf', None)
+    if buf is None:
+        buf = _dl_buf.buf = bytearray()
+    else:
+        buf.clear()
+    return buf
+
+def _acquire_temp_path():
+    """Check a reusable temp path out of the pool, creating one when empty"""
+    try:
+        return _temp_path_pool.get_nowait()
+    except queue.Empty:
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+        return path
+
+def _release_temp_path(path):
+    """Truncate a pooled temp path and return it for reuse.
+
+    Any document the LRU still holds open on this path is evicted first —
+    a cached fitz handle must never outlive the bytes it lazily reads.
+    """
+    _evict_cached_docs(path)
+    try:
+        fd = os.open(path, os.O_WRONLY)
+        try:
+            os.ftruncate(fd, 0)
+        finally:
+            os.close(fd)
+        _temp_path_pool.put_nowait(path)
+    except (OSError, queue.Full):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+def _link_spooled_upload(stream):
+    """Hard-link a rolled SpooledTemporaryFile's backing file to a temp path.
+
+    Werkzeug spills large uploads to disk already, so linking that inode
+    into place makes it addressable by name without copying every byte
+    back through userspace. Returns the new path, or None when the upload
+    is still in memory or linking isn't possible (O_TMPFILE inodes can't
+    be linked on some container filesystems) — the caller then falls back
+    to a conventional copy.
+    """
+    if not isinstance(stream, tempfile.SpooledTemporaryFile) or not getattr(stream, '_rolled', False):
+        return None
+    backing = getattr(stream, '_file', None)
+    if backing is None:
+        return None
+    stream.flush()
+    fd, dst = tempfile.mkstemp(suffix='.pdf')
+    os.close(fd)
+    os.unlink(dst)
+    try:
+        name = getattr(backing, 'name', None)
+        if isinstance(name, str) and os.path.exists(name):
+            os.link(name, dst)
+        else:
+            # O_TMPFILE-backed temp files have no name; link via procfs
+            os.link(f'/proc/self/fd/{backing.fileno()}', dst, follow_symlinks=True)
+        return dst
+    except OSError as link_error:
+        logger.info(f"Zero-copy link of spooled upload unavailable ({link_error}), copying instead")
+        return None
+
 @app.route('/upload', methods=['POST'])
 def upload_and_extract():
     """Upload and extract text from PDF file"""
@@ -162,33 +701,79 @@ def upload_and_extract():
         # Check if file was uploaded
         if 'file' not in request.files:
             return jsonify({'error': 'No file uploaded'}), 400
-        
+
         file = request.files['file']
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
-        
+
         # Check file extension
         if not file.filename.lower().endswith('.pdf'):
             return jsonify({'error': 'Only PDF files are supported'}), 400
-        
-        # Save uploaded file temporarily
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-        file.save(temp_file.name)
-        
+
+        # Spilled uploads are hard-linked into place instead of copied;
+        # uploads still in Werkzeug's memory buffer skip disk entirely and
+        # go straight to fitz as bytes
+        pdf_bytes = None
+        temp_from_pool = False
+        temp_path = _link_spooled_upload(file.stream)
+        if temp_path is None:
+            stream = file.stream
+            stream.seek(0)
+            if isinstance(stream, tempfile.SpooledTemporaryFile) and getattr(stream, '_rolled', False):
+                # On disk but not linkable — stream-copy into a pooled path
+                temp_path = _acquire_temp_path()
+                temp_from_pool = True
+                file.save(temp_path)
+            else:
+                pdf_bytes = stream.read()
+
         try:
-            # Try PyMuPDF first (better extraction)
-            result = extract_with_pymupdf(temp_file.name)
+            max_pages, max_chars = _parse_extraction_limits(request.form)
+
+            # Serve identical re-uploads from the content-hash cache; the
+            # budgets are part of the key so a truncated extraction never
+            # shadows a full one
+            if pdf_bytes is not None:
+                cache_key = (hashlib.sha256(pdf_bytes).hexdigest(), len(pdf_bytes),
+                             max_pages, max_chars)
+                temp_stat = None
+            else:
+                temp_stat = os.stat(temp_path)
+                cache_key = (hash_pdf_file(temp_path), temp_stat.st_size,
+                             max_pages, max_chars)
+            result = extract_cache_get(cache_key)
+
             if not result:
-                # Fallback to PyPDF2
-                logger.info("🔄 Falling back to PyPDF2...")
-                result = extract_with_pypdf2(temp_file.name)
-            
+                # Try PyMuPDF first (better extraction)
+                if pdf_bytes is not None:
+                    result, reason = extract_with_pymupdf_bytes(pdf_bytes, max_pages=max_pages, max_chars=max_chars)
+                else:
+                    result, reason = extract_with_pymupdf(temp_path, max_pages=max_pages, max_chars=max_chars, st=temp_stat)
+                if not result:
+                    # Encrypted/empty documents will fail in any reader —
+                    # don't pay for a second full parse
+                    if reason == REASON_ENCRYPTED:
+                        return jsonify({'error': 'PDF is password protected'}), 400
+                    if reason == REASON_EMPTY:
+                        return jsonify({'error': 'PDF has no extractable pages'}), 400
+                    if temp_path is None:
+                        # The fallback reader still wants a file on disk
+                        temp_path = _acquire_temp_path()
+                        temp_from_pool = True
+                        with open(temp_path, 'wb') as temp_out:
+                            temp_out.write(pdf_bytes)
+                    # Fallback to the pypdf/PyPDF2 reader
+                    logger.info(f"🔄 Falling back to {_get_fallback_reader()[2]}...")
+                    result, reason = extract_with_pypdf2(temp_path, max_pages=max_pages, max_chars=max_chars)
+                if result:
+                    extract_cache_put(cache_key, result)
+
             if not result:
                 return jsonify({'error': 'Failed to extract text from PDF'}), 500
             
             # Calculate basic metrics
             text = result['text']
-            word_count = len(text.split()) if text else 0
+            word_count = count_words(text)
             char_count = len(text) if text else 0
             
             response_data = {
@@ -205,15 +790,19 @@ def upload_and_extract():
             }
             
             logger.info(f"✅ Successfully extracted {word_count} words from uploaded PDF: {file.filename}")
-            return jsonify(response_data)
+            return _json_response(response_data)
             
         finally:
-            # Clean up temp file
-            try:
-                os.unlink(temp_file.name)
-            except:
-                pass
-                
+            # Return pooled temp paths; hard-linked ones are simply unlinked
+            if temp_path:
+                if temp_from_pool:
+                    _release_temp_path(temp_path)
+                else:
+                    try:
+                        os.unlink(temp_path)
+                    except:
+                        pass
+
     except Exception as e:
         logger.error(f"❌ Error processing uploaded PDF: {str(e)}")
         return jsonify({
@@ -231,73 +820,75 @@ def extract_pdf():
         file_path = data.get('file_path') or data.get('pdf_url')
         if not file_path:
             return jsonify({'error': 'file_path or pdf_url is required'}), 400
+        max_pages, max_chars = _parse_extraction_limits(data)
         logger.info(f"🔄 Processing PDF: {file_path}")
         
         # Handle both local files and URLs
-        temp_file = None
+        fallback_path = None
+        pdf_bytes = None
+        pdf_digest = None
+        pdf_path = None
         try:
             if file_path.startswith(('http://', 'https://')):
-                # Download file from URL with improved error handling
+                # Download file from URL straight into memory — PyMuPDF opens
+                # the buffer directly, so no temp file round-trip is needed
                 logger.info(f"📥 Downloading PDF from URL: {file_path}")
-                
+
                 try:
-                    response = requests.get(file_path, timeout=30, headers={
+                    buf = _get_download_buffer()
+                    with _http.get(file_path, stream=True, timeout=30, headers={
                         'User-Agent': 'Mozilla/5.0 (compatible; PDFExtractor/1.0)'
-                    })
-                    response.raise_for_status()
-                    
-                    # Check if response content is actually a PDF
-                    content_type = response.headers.get('content-type', '').lower()
-                    if content_type and 'pdf' not in content_type and not content_type.startswith('application/'):
-                        logger.warning(f"Unexpected content type: {content_type}")
-                    
+                    }) as response:
+                        response.raise_for_status()
+
+                        # Media type check: one set lookup on the bare type
+                        content_type = response.headers.get('content-type', '').split(';', 1)[0].strip().lower()
+                        if content_type and content_type not in _ACCEPTED_CT:
+                            logger.warning(f"Unexpected content type: {content_type}")
+
+                        # Magic-byte check on the first chunk, before the
+                        # rest of the body is even downloaded. The cache
+                        # hash is folded into the same loop so the CPU
+                        # hashes each chunk while the network fetches the
+                        # next one, instead of a second full pass afterwards
+                        hasher = hashlib.sha256()
+                        first_chunk = True
+                        for chunk in response.iter_content(chunk_size=1 << 20):
+                            if first_chunk and chunk:
+                                first_chunk = False
+                                if not chunk.startswith(b'%PDF'):
+                                    logger.warning("Downloaded content doesn't appear to be a valid PDF")
+                            hasher.update(chunk)
+                            buf += chunk
+                    pdf_bytes = bytes(buf)
+                    pdf_digest = hasher.hexdigest()
+
                     # Check if we got actual content
-                    if len(response.content) == 0:
+                    if len(pdf_bytes) == 0:
                         return jsonify({'error': 'Downloaded file is empty'}), 400
-                    
-                    # Check for PDF magic number
-                    if not response.content.startswith(b'%PDF'):
-                        logger.warning("Downloaded content doesn't appear to be a valid PDF")
-                    
+
                 except requests.exceptions.RequestException as req_error:
                     logger.error(f"Failed to download PDF: {str(req_error)}")
                     return jsonify({'error': f'Failed to download PDF: {str(req_error)}'}), 400
-                
-                # Create temp file
-                temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-                temp_file.write(response.content)
-                temp_file.close()
-                pdf_path = temp_file.name
-                
+
             elif file_path.startswith('file://'):
                 # Handle file:// URLs (local file paths from mobile apps)
                 logger.info(f"🔄 Attempting to forward local file to Docling service: {file_path}")
                 
-                # Try to forward to Docling service if available
-                try:
-                    docling_url = os.environ.get('DOCLING_SERVICE_URL', 'https://blii-pdf-extraction-production.up.railway.app')
-                    
-                    # Check if Docling service is available
-                    health_response = requests.get(f"{docling_url}/health", timeout=5)
-                    if health_response.ok and health_response.json().get('docling_available'):
-                        logger.info("✅ Docling service is available, suggesting file upload")
-                        return jsonify({
-                            'error': 'Local file paths require direct upload. Please use the upload endpoint or select the file again.',
-                            'code': 'LOCAL_FILE_UPLOAD_REQUIRED',
-                            'suggestion': 'Use the /upload endpoint with multipart/form-data to upload the file directly.',
-                            'docling_available': True,
-                            'upload_endpoint': f"{docling_url}/upload"
-                        }), 400
-                    else:
-                        logger.warning("⚠️ Docling service not available")
-                        return jsonify({
-                            'error': 'Local file paths are not accessible from the server. Please upload the file directly.',
-                            'code': 'LOCAL_FILE_ACCESS_DENIED',
-                            'docling_available': False
-                        }), 400
-                        
-                except Exception as docling_error:
-                    logger.warning(f"⚠️ Could not reach Docling service: {docling_error}")
+                # Check Docling availability (cached for 30s, so repeated
+                # local-file requests don't each pay a blocking probe)
+                docling_url = os.environ.get('DOCLING_SERVICE_URL', 'https://blii-pdf-extraction-production.up.railway.app')
+                if _docling_available(docling_url):
+                    logger.info("✅ Docling service is available, suggesting file upload")
+                    return jsonify({
+                        'error': 'Local file paths require direct upload. Please use the upload endpoint or select the file again.',
+                        'code': 'LOCAL_FILE_UPLOAD_REQUIRED',
+                        'suggestion': 'Use the /upload endpoint with multipart/form-data to upload the file directly.',
+                        'docling_available': True,
+                        'upload_endpoint': f"{docling_url}/upload"
+                    }), 400
+                else:
+                    logger.warning("⚠️ Docling service not available")
                     return jsonify({
                         'error': 'Local file paths are not accessible from the server. Please upload the file directly.',
                         'code': 'LOCAL_FILE_ACCESS_DENIED',
@@ -305,24 +896,56 @@ def extract_pdf():
                     }), 400
                 
             else:
-                # Use local file path
+                # Use local file path; one stat answers existence and size
                 pdf_path = file_path
-                if not os.path.exists(pdf_path):
+                try:
+                    pdf_stat = os.stat(pdf_path)
+                except OSError:
                     return jsonify({'error': f'File not found: {pdf_path}'}), 404
-            
-            # Try PyMuPDF first (better extraction)
-            result = extract_with_pymupdf(pdf_path)
+
+            # Serve repeated requests for identical bytes from the cache;
+            # the budgets are part of the key so a truncated extraction
+            # never shadows a full one
+            if pdf_bytes is not None:
+                cache_key = (pdf_digest, len(pdf_bytes), max_pages, max_chars)
+            else:
+                cache_key = (hash_pdf_file(pdf_path), pdf_stat.st_size,
+                             max_pages, max_chars)
+            result = extract_cache_get(cache_key)
+
             if not result:
-                # Fallback to PyPDF2
-                logger.info("🔄 Falling back to PyPDF2...")
-                result = extract_with_pypdf2(pdf_path)
-            
+                # Try PyMuPDF first (better extraction)
+                if pdf_bytes is not None:
+                    result, reason = extract_with_pymupdf_bytes(pdf_bytes, max_pages=max_pages, max_chars=max_chars)
+                else:
+                    result, reason = extract_with_pymupdf(pdf_path, max_pages=max_pages, max_chars=max_chars, st=pdf_stat)
+                if not result:
+                    # Encrypted/empty documents will fail in any reader —
+                    # don't pay for a second full parse
+                    if reason == REASON_ENCRYPTED:
+                        return jsonify({'error': 'PDF is password protected'}), 400
+                    if reason == REASON_EMPTY:
+                        return jsonify({'error': 'PDF has no extractable pages'}), 400
+                    if pdf_bytes is not None:
+                        # The fallback reader still wants a file on disk
+                        fallback_path = _acquire_temp_path()
+                        with open(fallback_path, 'wb') as temp_out:
+                            temp_out.write(pdf_bytes)
+                        reader_path = fallback_path
+                    else:
+                        reader_path = pdf_path
+                    # Fallback to the pypdf/PyPDF2 reader
+                    logger.info(f"🔄 Falling back to {_get_fallback_reader()[2]}...")
+                    result, reason = extract_with_pypdf2(reader_path, max_pages=max_pages, max_chars=max_chars)
+                if result:
+                    extract_cache_put(cache_key, result)
+
             if not result:
                 return jsonify({'error': 'Failed to extract text from PDF'}), 500
             
             # Calculate basic metrics
             text = result['text']
-            word_count = len(text.split()) if text else 0
+            word_count = count_words(text)
             char_count = len(text) if text else 0
             
             response_data = {
@@ -339,16 +962,13 @@ def extract_pdf():
             }
             
             logger.info(f"✅ Successfully extracted {word_count} words from PDF")
-            return jsonify(response_data)
+            return _json_response(response_data)
             
         finally:
-            # Clean up temp file
-            if temp_file and os.path.exists(temp_file.name):
-                try:
-                    os.unlink(temp_file.name)
-                except:
-                    pass
-                    
+            # Return the pooled fallback temp path, if one was needed
+            if fallback_path:
+                _release_temp_path(fallback_path)
+
     except Exception as e:
         logger.error(f"❌ Error processing PDF: {str(e)}")
         return jsonify({
@@ -370,14 +990,17 @@ def root():
     })
 
 if __name__ == '__main__':
+    # Development entry point only — in production run via start_simple_service.sh
+    # (gunicorn with gthread workers) so one large extraction doesn't block
+    # every other client on the single-threaded dev server.
     port = int(os.environ.get('PORT', 8080))
-    
-    logger.info("🚀 Starting Simple PDF Extraction Service")
+
+    logger.info("🚀 Starting Simple PDF Extraction Service (dev server)")
     logger.info(f"📦 Service starting on port {port}")
     logger.info(f"🔧 Debug mode: {os.environ.get('FLASK_ENV') == 'development'}")
     
     # Test the PDF extractors
-    logger.info("✅ PyPDF2 available")
+    logger.info(f"✅ {_get_fallback_reader()[2]} available")
     logger.info("✅ PyMuPDF available")
     
     app.run(
@@ -0,0 +1,20 @@
+#!/bin/bash
+
+# Set default port if not provided
+export PORT=${PORT:-8080}
+
+# One worker per core, each with a few threads: the extractors are C-bound
+# (fitz/PyPDF2/tesserocr release the GIL), so gthread workers scale across
+# concurrent PDFs instead of one slow OCR request blocking every client.
+WORKERS=${WEB_CONCURRENCY:-$(nproc)}
+
+echo "Starting Enhanced PDF service on port $PORT with $WORKERS workers"
+
+exec gunicorn enhanced_pdf_service:app \
+    --workers "$WORKERS" \
+    --worker-class gthread \
+    --threads 4 \
+    --bind 0.0.0.0:$PORT \
+    --timeout 180 \
+    --max-requests 100 \
+    --max-requests-jitter 10
@@ -0,0 +1,21 @@
+#!/bin/bash
+
+# Set default port if not provided
+export PORT=${PORT:-8080}
+
+# One worker per core with a couple of threads each: PyMuPDF releases the
+# GIL inside get_text, so gthread workers extract concurrently without the
+# fork overhead of spawning a process per request, and a 200-page PDF no
+# longer serializes every other client behind the single-threaded dev server.
+WORKERS=${WEB_CONCURRENCY:-$(nproc)}
+
+echo "Starting Simple PDF service on port $PORT with $WORKERS workers"
+
+exec gunicorn simple_pdf_service:app \
+    --workers "$WORKERS" \
+    --worker-class gthread \
+    --threads 2 \
+    --bind 0.0.0.0:$PORT \
+    --timeout 120 \
+    --max-requests 100 \
+    --max-requests-jitter 10